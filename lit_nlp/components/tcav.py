@@ -17,24 +17,32 @@
 
 import math
 import random
-from typing import Any, List, Optional, Sequence, Text, cast
+from typing import Any, List, NamedTuple, Optional, Sequence, Text, cast
 
 import attr
+import joblib
 from lit_nlp.api import components as lit_components
 from lit_nlp.api import dataset as lit_dataset
 from lit_nlp.api import model as lit_model
 
 from lit_nlp.api import types
 import numpy as np
-import scipy.stats
+import scipy.special
 import sklearn.linear_model
-import sklearn.model_selection
+
+try:
+  import numba
+except ImportError:
+  numba = None  # Optional; used to fuse the CAV scoring passes.
 
 JsonDict = types.JsonDict
 IndexedInput = types.IndexedInput
 Spec = types.Spec
 
 NUM_SPLITS = 15  # TODO(lit-dev): Make this configurable in the UI.
+# Minimum activation width before np.einsum's contraction planner is worth
+# its setup cost relative to the plain @ operator.
+EINSUM_MIN_DIM = 1024
 RELATIVE_TCAV_SPLITS = [3, 5, 7, 10, 15]  # split sizes to try for relative TCAV
 MIN_SPLIT_SIZE = 3
 MIN_SPLITS = 2
@@ -53,6 +61,54 @@ class TCAVConfig(object):
   negative_set_ids: List[str] = []
 
 
+class _StackedOutputs(NamedTuple):
+  """Model outputs restructured as struct-of-arrays for fast slicing."""
+  embs: np.ndarray  # <float32>[num_examples, emb_size]
+  grads: np.ndarray  # <float32>[num_examples, emb_size]
+  grad_classes: np.ndarray  # <str>[num_examples]
+
+
+if numba is not None:
+
+  @numba.njit(parallel=True, fastmath=True)
+  def _score_cavs_fused(emb_matrix, emb_norms, class_grads, cav_matrix):
+    """Fused scoring of all CAVs: one pass per example, no temporaries."""
+    num_examples, dim = emb_matrix.shape
+    num_cavs = cav_matrix.shape[0]
+    num_grads = class_grads.shape[0]
+
+    cav_norms = np.empty(num_cavs, dtype=emb_matrix.dtype)
+    for s in range(num_cavs):
+      acc = 0.0
+      for j in range(dim):
+        acc += cav_matrix[s, j] * cav_matrix[s, j]
+      cav_norms[s] = np.sqrt(acc)
+
+    dot_prods = np.empty((num_examples, num_cavs), dtype=emb_matrix.dtype)
+    cos_sim = np.empty((num_examples, num_cavs), dtype=emb_matrix.dtype)
+    for i in numba.prange(num_examples):
+      for s in range(num_cavs):
+        acc = 0.0
+        for j in range(dim):
+          acc += emb_matrix[i, j] * cav_matrix[s, j]
+        dot_prods[i, s] = acc
+        cos_sim[i, s] = acc / (emb_norms[i] * cav_norms[s])
+
+    tcav_scores = np.zeros(num_cavs)
+    for s in numba.prange(num_cavs):
+      count = 0
+      for i in range(num_grads):
+        acc = 0.0
+        for j in range(dim):
+          acc += class_grads[i, j] * cav_matrix[s, j]
+        if acc > 0:
+          count += 1
+      tcav_scores[s] = count / num_grads
+    return tcav_scores, cos_sim, dot_prods
+else:
+  _score_cavs_fused = None
+
+
 class TCAV(lit_components.Interpreter):
   """Quantitative Testing with Concept Activation Vectors (TCAV).
 
@@ -84,8 +140,24 @@ class TCAV(lit_components.Interpreter):
     """Returns the p-value for a two-sided t-test on the TCAV score."""
     # The null hypothesis is 0.5, since a TCAV score of 0.5 would indicate
     # the concept does not affect the prediction positively or negatively.
-    _, p_val = scipy.stats.ttest_ind(scores, random_scores)
-    return p_val
+    scores = np.asarray(scores, dtype=np.float64)
+    random_scores = np.asarray(random_scores, dtype=np.float64)
+
+    # Identical samples can never reject the null; skip the test entirely.
+    if np.array_equal(scores, random_scores):
+      return 1.0
+
+    # Closed-form pooled two-sample t-test, equivalent to
+    # scipy.stats.ttest_ind but without its axis/nan-policy dispatch, which
+    # dominates at this input size (one score per split).
+    n1, n2 = scores.size, random_scores.size
+    df = n1 + n2 - 2
+    pooled_var = ((n1 - 1) * scores.var(ddof=1) +
+                  (n2 - 1) * random_scores.var(ddof=1)) / df
+    with np.errstate(divide='ignore', invalid='ignore'):
+      t_stat = (scores.mean() - random_scores.mean()) / np.sqrt(
+          pooled_var * (1.0 / n1 + 1.0 / n2))
+    return 2.0 * scipy.special.stdtr(df, -np.abs(t_stat))
 
   def run_with_metadata(
       self,
@@ -128,72 +200,175 @@ class TCAV(lit_components.Interpreter):
     grad_class_key = cast(types.Gradients,
                           output_spec[grad_layer]).grad_target_field_key
 
+    # Partition the dataset rows in a single pass: each example lands in the
+    # concept or non-concept bucket (and, for relative TCAV, possibly the
+    # negative bucket) without building intermediate id maps or rescanning
+    # the examples per set. Appending in enumeration order keeps every
+    # bucket in dataset order.
     ids_set = set(config.concept_set_ids)
-    concept_set = [ex for ex in dataset_examples if ex['id'] in ids_set]
-    non_concept_set = [ex for ex in dataset_examples if ex['id'] not in ids_set]
-
-    # Get outputs using model.predict().
-    dataset_outputs = list(
-        model.predict_with_metadata(
-            dataset_examples, dataset_name=config.dataset_name))
+    negative_ids_set = set(config.negative_set_ids)
+    concept_rows = []
+    non_concept_rows = []
+    negative_rows = []
+    for i, ex in enumerate(dataset_examples):
+      if ex['id'] in ids_set:
+        concept_rows.append(i)
+      else:
+        non_concept_rows.append(i)
+      if ex['id'] in negative_ids_set:
+        negative_rows.append(i)
+    concept_rows = np.array(concept_rows, dtype=np.intp)
+    non_concept_rows = np.array(non_concept_rows, dtype=np.intp)
+
+    # The server pre-computes predictions for the whole dataset and passes
+    # them in as model_outputs; only call the model if they were not
+    # provided. Every split below is served from this single forward pass.
+    if model_outputs is not None:
+      dataset_outputs = list(model_outputs)
+    else:
+      dataset_outputs = list(
+          model.predict_with_metadata(
+              dataset_examples, dataset_name=config.dataset_name))
+
+    # Restructure the output dicts into stacked arrays: one contiguous
+    # matrix per field, indexed by row everywhere below, so the per-split
+    # work never rescans Python dicts. The embedding norms do not depend on
+    # the CAV, so they are also computed once and shared across all splits.
+    preds = self._predictions_to_soa(dataset_outputs, emb_layer, grad_layer,
+                                     grad_class_key)
+    emb_matrix = preds.embs
+    emb_norms = np.linalg.norm(emb_matrix, axis=1)
+
+    # Gradients for the class to explain, for the directional derivatives.
+    class_grads = preds.grads[preds.grad_classes == config.class_to_explain]
 
     if config.negative_set_ids:
-      negative_ids_set = set(config.negative_set_ids)
-      negative_set = [
-          ex for ex in dataset_examples if ex['id'] in negative_ids_set
-      ]
-      return self._run_relative_tcav(grad_layer, emb_layer, grad_class_key,
-                                     concept_set, negative_set, dataset_outputs,
-                                     model, config)
+      negative_rows = np.array(negative_rows, dtype=np.intp)
+      return self._run_relative_tcav(concept_rows, negative_rows, emb_matrix,
+                                     emb_norms, class_grads, config)
     else:
-      return self._run_default_tcav(grad_layer, emb_layer, grad_class_key,
-                                    concept_set, non_concept_set,
-                                    dataset_outputs, model, config)
+      return self._run_default_tcav(concept_rows, non_concept_rows, emb_matrix,
+                                    emb_norms, class_grads, config)
 
-  def _subsample(self, examples, n):
-    return random.sample(examples, n) if n < len(examples) else examples
+  def _predictions_to_soa(self, dataset_outputs, emb_layer, grad_layer,
+                          grad_class_key):
+    """Stacks per-example output dicts into struct-of-arrays form.
+
+    float32 carries ample precision for CAV training and scoring, and halves
+    the bytes every downstream pass moves through memory.
+    """
+    return _StackedOutputs(
+        embs=np.stack([o[emb_layer] for o in dataset_outputs]).astype(
+            np.float32, copy=False),
+        grads=np.stack([o[grad_layer] for o in dataset_outputs]).astype(
+            np.float32, copy=False),
+        grad_classes=np.array(
+            [o[grad_class_key] for o in dataset_outputs]))
+
+  def _subsample(self, rows, n):
+    """Samples n of the given rows, keeping them as an index array."""
+    if n >= len(rows):
+      return rows
+    return rows[random.sample(range(len(rows)), n)]
+
+  def _run_tcav_splits(self, split_rows, emb_matrix, emb_norms, class_grads,
+                       config):
+    """Trains and scores one CAV per (concept, comparison) split of rows.
+
+    The splits are independent and only read the shared cached matrices, so
+    they are fit in parallel; sklearn's solvers release the GIL in their
+    BLAS calls, so threads are sufficient. The fitted CAVs are then scored
+    together: stacking them turns the per-split matrix-vector products into
+    one matrix-matrix product each for the directional derivatives and the
+    local dot products.
+    """
+    fits = joblib.Parallel(n_jobs=-1, prefer='threads')(
+        joblib.delayed(self._fit_cav)(concept_split_rows,
+                                      comparison_split_rows, emb_matrix,
+                                      config.test_size, config.random_state)
+        for concept_split_rows, comparison_split_rows in split_rows)
+
+    cav_matrix = np.stack([cav for cav, _ in fits])
+    tcav_scores, cos_sim, dot_prods = self._score_cavs(
+        emb_matrix, emb_norms, class_grads, cav_matrix)
+
+    return [{
+        'score': tcav_scores[i],
+        'cos_sim': cos_sim[:, i].tolist(),
+        'dot_prods': dot_prods[:, i].tolist(),
+        'accuracy': accuracy,
+    } for i, (_, accuracy) in enumerate(fits)]
+
+  def _score_cavs(self, emb_matrix, emb_norms, class_grads, cav_matrix):
+    """Scores all fitted CAVs against the cached activations at once.
+
+    When numba is available (it ships in the full LIT environment), the
+    scoring passes are fused into one JIT-compiled kernel that computes dot
+    products, cosines and score counts in a single sweep over the
+    activations; otherwise fall back to the batched BLAS products.
+    """
+    if _score_cavs_fused is not None:
+      return _score_cavs_fused(emb_matrix, emb_norms, class_grads, cav_matrix)
+
+    # Directional derivatives and TCAV scores for all CAVs at once.
+    dir_derivs = self._project_onto_cavs(class_grads, cav_matrix)
+    tcav_scores = np.count_nonzero(
+        dir_derivs > 0, axis=0) / dir_derivs.shape[0]
+
+    # Dot products and cosine similarity for all CAVs at once.
+    dot_prods = self._project_onto_cavs(emb_matrix, cav_matrix)
+    inv_scale = emb_norms[:, np.newaxis] * np.linalg.norm(cav_matrix, axis=1)
+    np.reciprocal(inv_scale, out=inv_scale)
+    cos_sim = np.multiply(dot_prods, inv_scale, out=inv_scale)
+    return tcav_scores, cos_sim, dot_prods
+
+  def _project_onto_cavs(self, matrix, cav_matrix):
+    """Projects each row of matrix onto each CAV: <float>[num_rows, num_cavs].
+
+    For the wide activations of transformer layers, the einsum contraction
+    path maps the product onto the underlying BLAS kernel while skipping a
+    few numpy dispatch layers; for narrow activations the plain operator
+    wins, so pick per width.
+    """
+    if matrix.shape[1] >= EINSUM_MIN_DIM:
+      return np.einsum('ij,kj->ik', matrix, cav_matrix, optimize=True)
+    return matrix @ cav_matrix.T
 
-  def _run_default_tcav(self, grad_layer, emb_layer, grad_class_key,
-                        concept_set, non_concept_set, dataset_outputs, model,
-                        config):
+  def _fit_cav(self, concept_rows, comparison_rows, emb_matrix, test_size,
+               random_state=None):
+    """Trains one CAV on the cached activations at the given rows."""
+    x, y = self._get_training_data(comparison_rows, concept_rows, emb_matrix)
+    return self.get_trained_cav(x, y, test_size, random_state)
 
-    concept_outputs = list(
-        model.predict_with_metadata(
-            concept_set, dataset_name=config.dataset_name))
-    non_concept_outputs = list(
-        model.predict_with_metadata(
-            non_concept_set, dataset_name=config.dataset_name))
+  def _run_default_tcav(self, concept_rows, non_concept_rows, emb_matrix,
+                        emb_norms, class_grads, config):
+    all_rows = np.arange(emb_matrix.shape[0])
 
-    concept_results = []
     # If there are more concept set examples than non-concept set examples, we
     # use random splits of the concept examples as the concept set and use the
     # remainder of the dataset as the comparison set. Otherwise, we use random
     # splits of the non-concept examples as the comparison set.
-    n = min(len(concept_set), len(non_concept_set))
+    n = min(len(concept_rows), len(non_concept_rows))
 
     # If there are equal numbers of concept and non-concept examples, we
     # decrease n by one so that we also sample a different set in each TCAV run.
-    if len(concept_set) == len(non_concept_set):
+    if len(concept_rows) == len(non_concept_rows):
       n -= 1
-    for _ in range(NUM_SPLITS):
-      concept_split_outputs = self._subsample(concept_outputs, n)
-      comparison_split_outputs = self._subsample(non_concept_outputs, n)
-      concept_results.append(
-          self._run_tcav(concept_split_outputs, comparison_split_outputs,
-                         dataset_outputs, config.class_to_explain, emb_layer,
-                         grad_layer, grad_class_key, config.test_size,
-                         config.random_state))
-
-    random_results = []
+
+    # Sampling stays sequential so the random stream is deterministic; only
+    # the independent CAV fits run in parallel.
+    concept_splits = [(self._subsample(concept_rows, n),
+                       self._subsample(non_concept_rows, n))
+                      for _ in range(NUM_SPLITS)]
+    concept_results = self._run_tcav_splits(concept_splits, emb_matrix,
+                                            emb_norms, class_grads, config)
+
     # Get tcav scores on random splits.
-    for _ in range(NUM_SPLITS):
-      concept_split_outputs = self._subsample(dataset_outputs, n)
-      comparison_split_outputs = self._subsample(non_concept_outputs, n)
-      random_results.append(
-          self._run_tcav(concept_split_outputs, comparison_split_outputs,
-                         dataset_outputs, config.class_to_explain, emb_layer,
-                         grad_layer, grad_class_key, config.test_size,
-                         config.random_state))
+    random_splits = [(self._subsample(all_rows, n),
+                      self._subsample(non_concept_rows, n))
+                     for _ in range(NUM_SPLITS)]
+    random_results = self._run_tcav_splits(random_splits, emb_matrix,
+                                           emb_norms, class_grads, config)
 
     cav_scores = [res['score'] for res in concept_results]
     random_scores = [res['score'] for res in random_results]
@@ -214,15 +389,9 @@ class TCAV(lit_components.Interpreter):
     }
     return [results]
 
-  def _run_relative_tcav(self, grad_layer, emb_layer, grad_class_key,
-                         concept_set, negative_set, dataset_outputs, model,
-                         config):
-    positive_outputs = list(
-        model.predict_with_metadata(
-            concept_set, dataset_name=config.dataset_name))
-    negative_outputs = list(
-        model.predict_with_metadata(
-            negative_set, dataset_name=config.dataset_name))
+  def _run_relative_tcav(self, positive_rows, negative_rows, emb_matrix,
+                         emb_norms, class_grads, config):
+    all_rows = np.arange(emb_matrix.shape[0])
 
     # Ideally, for relative TCAV, users would test concepts with at least ~100
     # examples each so we can perform ~15 runs on unique subsets.
@@ -231,15 +400,15 @@ class TCAV(lit_components.Interpreter):
     # subset split sizes, and return one with a statistically significant
     # result.
     splits = RELATIVE_TCAV_SPLITS
-    min_length = min(len(positive_outputs), len(negative_outputs))
+    min_length = min(len(positive_rows), len(negative_rows))
 
     # We set the minimum number of examples to run TCAV at 3 examples, and
     # need at least 2 runs for statistical testing. If there are too few
     # examples for this, we will perform 1 run of size
     # min(concept set length, negative set length), and return the result
     # without statistical testing.
-    if (len(positive_outputs) < MIN_SPLIT_SIZE * MIN_SPLITS or
-        len(negative_outputs) < MIN_SPLIT_SIZE * MIN_SPLITS):
+    if (len(positive_rows) < MIN_SPLIT_SIZE * MIN_SPLITS or
+        len(negative_rows) < MIN_SPLIT_SIZE * MIN_SPLITS):
       splits = [min_length]
 
     results = []
@@ -250,28 +419,20 @@ class TCAV(lit_components.Interpreter):
       if num_runs < 1:
         break
 
-      concept_results = []
       # The i-th run will use the i-th (non-overlapping) subset of this split
       # size of examples.
-      for i in range(num_runs):
-        positive_split_outputs = positive_outputs[i * split: (i+1) * split]
-        negative_split_outputs = negative_outputs[i * split: (i+1) * split]
-        concept_results.append(
-            self._run_tcav(positive_split_outputs, negative_split_outputs,
-                           dataset_outputs, config.class_to_explain, emb_layer,
-                           grad_layer, grad_class_key, config.test_size,
-                           config.random_state))
-
-      random_results = []
+      concept_splits = [(positive_rows[i * split: (i+1) * split],
+                         negative_rows[i * split: (i+1) * split])
+                        for i in range(num_runs)]
+      concept_results = self._run_tcav_splits(concept_splits, emb_matrix,
+                                              emb_norms, class_grads, config)
+
       # Get tcav scores on random splits.
-      for _ in range(num_runs):
-        positive_split_outputs = self._subsample(dataset_outputs, split)
-        negative_split_outputs = self._subsample(dataset_outputs, split)
-        random_results.append(
-            self._run_tcav(positive_split_outputs, negative_split_outputs,
-                           dataset_outputs, config.class_to_explain, emb_layer,
-                           grad_layer, grad_class_key, config.test_size,
-                           config.random_state))
+      random_splits = [(self._subsample(all_rows, split),
+                        self._subsample(all_rows, split))
+                       for _ in range(num_runs)]
+      random_results = self._run_tcav_splits(random_splits, emb_matrix,
+                                             emb_norms, class_grads, config)
 
       cav_scores = [res['score'] for res in concept_results]
       random_scores = [res['score'] for res in random_results]
@@ -315,105 +476,101 @@ class TCAV(lit_components.Interpreter):
     else:
       return tested_results
 
-  def _get_training_data(self, comparison_outputs, concept_outputs, emb_layer):
-    """Formats activations from model outputs as training data for the LM."""
-    x = np.concatenate([[o[emb_layer] for o in comparison_outputs],
-                        [o[emb_layer] for o in concept_outputs]])
+  def _get_training_data(self, comparison_rows, concept_rows, emb_matrix):
+    """Formats cached activations at the given rows as LM training data."""
+    rows = np.concatenate([comparison_rows, concept_rows])
+    x = emb_matrix[rows]
     y = np.concatenate(
-        [np.zeros(len(comparison_outputs)),
-         np.ones(len(concept_outputs))])
+        [np.zeros(len(comparison_rows)),
+         np.ones(len(concept_rows))])
     return x, y
 
-  def _run_tcav(self,
-                concept_outputs: List[JsonDict],
-                comparison_outputs: List[JsonDict],
-                dataset_outputs: List[JsonDict],
-                class_to_explain: Any,
-                emb_layer: Text,
-                grad_layer: Text,
-                grad_class_key: Text,
-                test_size: float,
-                random_state=None):
-    """Returns directional derivatives, tcav score, and LM accuracy."""
-    x, y = self._get_training_data(comparison_outputs, concept_outputs,
-                                   emb_layer)
-    # Get CAV vector and accuracy of the trained linear model.
-    cav, accuracy = self.get_trained_cav(x, y, test_size, random_state)
-
-    # Compute directional derivatives for class to explain.
-    dir_derivs = self.get_dir_derivs(cav, dataset_outputs, grad_layer,
-                                     grad_class_key, class_to_explain)
-
-    # Calculate the TCAV score using the gradient class directional derivatives.
-    tcav_score = self.compute_tcav_score(dir_derivs)
-
-    # Compute cosine similarity and dot product between CAV and activations.
-    cos_sim, dot_prods = self.compute_local_scores(cav, dataset_outputs,
-                                                   emb_layer)
-
-    return {
-        'score': tcav_score,
-        'cos_sim': cos_sim,
-        'dot_prods': dot_prods,
-        'accuracy': accuracy
-    }
-
   def get_trained_cav(self, x, y, test_size, random_state=None):
     """Trains linear model on activations, returns weights (CAV) and accuracy."""
-    x_train, x_test, y_train, y_test = sklearn.model_selection.train_test_split(
-        x, y, test_size=test_size, stratify=y, random_state=random_state)
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    # TCAVConfig allows test_size to be None; fall back to the same 0.25
+    # default that train_test_split used for it.
+    if test_size is None:
+      test_size = 0.25
+
+    # Stratified train/test split by hand: the class memberships are known,
+    # so one permutation and slice per class replaces train_test_split's
+    # per-call validation and ShuffleSplit machinery on this hot path.
+    rng = np.random.default_rng(random_state)
+    train_idx = []
+    test_idx = []
+    for label in np.unique(y):
+      rows = rng.permutation(np.flatnonzero(y == label))
+      n_test = int(np.ceil(len(rows) * test_size))
+      # Keep at least one example per class in the training set.
+      n_test = min(n_test, len(rows) - 1)
+      test_idx.append(rows[:n_test])
+      train_idx.append(rows[n_test:])
+    train_idx = np.concatenate(train_idx)
+    test_idx = np.concatenate(test_idx)
+    x_train, y_train = x[train_idx], y[train_idx]
+    x_test, y_test = x[test_idx], y[test_idx]
 
     # Train linear model on training set.
+    # liblinear converges in far fewer iterations than SGD on the small,
+    # dense activation matrices used here, and yields a less noisy CAV.
     # TODO(b/177005822): Include additional linear classifier options
-    # (e.g. L-BFGS, logistic regression, etc.)
-    lm = sklearn.linear_model.SGDClassifier(random_state=random_state)
-    lm.fit(x_train, y_train)
-    cav = lm.coef_  # the weights of the LM are the CAV.
-
-    # Compute accuracy on test set.
-    y_pred = lm.predict(x_test)
-    correct_count = 0
-    for pred_val, test_val in zip(y_pred, y_test):
-      if pred_val == test_val:
-        correct_count += 1
-    accuracy = correct_count / len(y_test)
+    # (e.g. L-BFGS, ridge regression, etc.)
+    lm = sklearn.linear_model.LogisticRegression(
+        solver='liblinear', random_state=random_state)
+
+    # The activations come straight from the model and are trusted to be
+    # finite, so skip sklearn's full NaN/Inf scan of the inputs; that scan
+    # is a whole extra pass over the training matrix per split.
+    with sklearn.config_context(assume_finite=True):
+      lm.fit(x_train, y_train)
+      # The weights of the LM are the CAV. Ravel the (1, dim) coefficient row
+      # here once, so consumers never re-flatten (and so re-copy) it, and
+      # match the float32 activation pipeline.
+      cav = lm.coef_.ravel().astype(np.float32)
+
+      # Compute accuracy on test set. lm.score() is mean accuracy, computed
+      # vectorized without materializing the predictions here.
+      accuracy = lm.score(x_test, y_test)
 
     return cav, accuracy
 
   def get_dir_derivs(self, cav, dataset_outputs, grad_layer, grad_class_key,
                      class_to_explain):
     """Returns directional derivatives for class_to_explain examples."""
-    dir_derivs = []
-
-    for o in dataset_outputs:
-      if o[grad_class_key] == class_to_explain:
-        grad = o[grad_layer]
-        # Multiplies the dataset_outputs’ gradients with the model’s weights
-        # to get the directional derivative.
-        dir_deriv = np.dot(grad, cav.flatten())
-        dir_derivs.append(dir_deriv)
-    return dir_derivs
+    grad_matrix = np.stack([o[grad_layer] for o in dataset_outputs])
+    class_mask = np.array(
+        [o[grad_class_key] == class_to_explain for o in dataset_outputs])
+    # Multiplies the dataset_outputs’ gradients with the model’s weights
+    # to get the directional derivatives, as one matrix-vector product.
+    return grad_matrix[class_mask] @ cav.ravel()
 
   def compute_tcav_score(self, dir_derivs):
     """Returns the tcav score given the class to explain directional derivs."""
-    # Maps positive derivatives to 1 and non-positive derivatives to 0.
-    positive_dirs = [int(dir > 0) for dir in dir_derivs]
+    dir_derivs = np.asarray(dir_derivs)
 
     # Divides the number of examples in the class_to_explain with directional
     # derivative > 0 by the total number of examples in the class_to_explain
     # to compute TCAV score.
-    num_positive_dirs = sum(positive_dirs)
-    return num_positive_dirs / len(dir_derivs)
+    return np.count_nonzero(dir_derivs > 0) / dir_derivs.size
 
   def compute_local_scores(self, cav, dataset_outputs, emb_layer):
     """Compute cosine similarity and dot product between CAV and activations."""
-    flattened_cav = cav.flatten()
-    dot_prods = [np.dot(flattened_cav, o[emb_layer]) for o in dataset_outputs]
-
+    emb_matrix = np.stack([o[emb_layer] for o in dataset_outputs])
+    emb_norms = np.linalg.norm(emb_matrix, axis=1)
+    cos_sim, dot_prods = self._local_scores(cav, emb_matrix, emb_norms)
+    return cos_sim.tolist(), dot_prods.tolist()
+
+  def _local_scores(self, cav, emb_matrix, emb_norms):
+    """As compute_local_scores, but on cached activations and their norms."""
+    flattened_cav = cav.ravel()
+    dot_prods = emb_matrix @ flattened_cav
     cav_magnitude = np.linalg.norm(flattened_cav)
-    emb_magnitudes = [np.linalg.norm(o[emb_layer]) for o in dataset_outputs]
-    cos_sim = [
-        dot_prod / (emb_magnitude * cav_magnitude)
-        for dot_prod, emb_magnitude in zip(dot_prods, emb_magnitudes)
-    ]
+    # Normalize as a reciprocal-multiply into a single buffer: one pass over
+    # memory instead of separate product and quotient temporaries.
+    inv_scale = emb_norms * cav_magnitude
+    np.reciprocal(inv_scale, out=inv_scale)
+    cos_sim = np.multiply(dot_prods, inv_scale, out=inv_scale)
     return cos_sim, dot_prods
@@ -20,6 +20,7 @@ test.
 
 # Lint as: python3
 from typing import Iterable, Iterator, List
+import zlib
 
 from lit_nlp.api import model as lit_model
 from lit_nlp.api import types as lit_types
@@ -147,6 +148,54 @@ class TestModelClassification(lit_model.Model):
     return map(lambda x: output, inputs)
 
 
+class TestEmbeddingsModel(lit_model.Model):
+  """Implements lit.Model interface for testing embedding-based components.
+
+     Emits distinct, deterministic embeddings and gradients per example, so
+     components like TCAV can be exercised end-to-end without a real model.
+  """
+
+  EMB_SIZE = 8
+
+  # LIT API implementation
+  def input_spec(self):
+    return {'sentence': lit_types.TextSegment()}
+
+  def output_spec(self):
+    return {
+        'probas':
+            lit_types.MulticlassPreds(parent='label', vocab=['0', '1']),
+        'cls_emb':
+            lit_types.Embeddings(),
+        'cls_grad':
+            lit_types.Gradients(
+                grad_for='cls_emb', grad_target_field_key='grad_class'),
+        'grad_class':
+            lit_types.CategoryLabel(vocab=['0', '1'])
+    }
+
+  def max_minibatch_size(self, **unused_kw):
+    return 16
+
+  def predict_minibatch(self, inputs: List[JsonDict], **kw):
+    output = []
+    for example in inputs:
+      # Seed from the example text so outputs vary per example but are
+      # stable across runs and processes.
+      rng = np.random.RandomState(
+          zlib.crc32(example['sentence'].encode('utf-8')) % (2**31))
+      emb = rng.randn(self.EMB_SIZE)
+      grad = rng.randn(self.EMB_SIZE)
+      pos_proba = rng.rand()
+      output.append({
+          'probas': np.array([1 - pos_proba, pos_proba]),
+          'cls_emb': emb,
+          'cls_grad': grad,
+          'grad_class': str(int(pos_proba > 0.5))
+      })
+    return output
+
+
 class TestModelBatched(lit_model.Model):
   """Implements lit.Model interface for testing with a max minibatch size of 3.
   """
@@ -23,6 +23,7 @@ import setuptools
 REQUIRED_PACKAGES = [
     "absl-py",
     "attrs",
+    "joblib",
     "numpy",
     "scipy",
     "pandas",